@@ -10,41 +10,59 @@ from reportlab.lib.styles import getSampleStyleSheet
 import zipfile
 import datetime
 
-# Debug log helper
+# Debug log helper, only renders when debug mode is on in the sidebar.
+# Pass a callable to defer building expensive messages until they are shown.
 def log_debug(message):
+    if not st.session_state.get("debug"):
+        return
+    if callable(message):
+        message = message()
     st.write(f"**[DEBUG]** {message}")
 
+# Cashflow rows that make up free cash flow (operating cash + capex)
+_FCF_ROWS = ["Total Cash From Operating Activities", "Capital Expenditures"]
+
+# Raised when yfinance returns no cashflow data, kept distinct from yfinance's own errors
+class _NoCashflowData(Exception):
+    pass
+
+# Cached yfinance fetch so Streamlit reruns don't hit the network again
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _ticker_cashflow(ticker, quarterly=False):
+    stock = yf.Ticker(ticker)
+    cashflow_df = stock.quarterly_cashflow if quarterly else stock.cashflow
+    # yfinance returns an empty frame on failed requests; raising keeps it out of the cache
+    if cashflow_df is None or cashflow_df.empty:
+        raise _NoCashflowData(f"No {'quarterly' if quarterly else 'annual'} cashflow data for {ticker}")
+    return cashflow_df
+
 def fetch_financial_data(ticker):
     try:
         log_debug(f"Fetching financial data for {ticker}...")
-        stock = yf.Ticker(ticker)
         
-        cashflow_df = stock.cashflow
-        if cashflow_df is None or cashflow_df.empty:
+        try:
+            cashflow_df = _ticker_cashflow(ticker)
+        except _NoCashflowData:
             log_debug("Annual cashflow empty, trying quarterly cashflow...")
-            cashflow_df = stock.quarterly_cashflow
-
-        if cashflow_df is None or cashflow_df.empty:
-            log_debug("Both annual and quarterly cashflows are empty.")
-            return None
+            try:
+                cashflow_df = _ticker_cashflow(ticker, quarterly=True)
+            except _NoCashflowData:
+                log_debug("Both annual and quarterly cashflows are empty.")
+                return None
         
-        log_debug(f"Cashflow data available: {cashflow_df.index.tolist()}")
+        log_debug(lambda: f"Cashflow data available: {cashflow_df.index.tolist()}")
         
-        if "Total Cash From Operating Activities" in cashflow_df.index:
-            cfo = cashflow_df.loc["Total Cash From Operating Activities"]
-        else:
-            log_debug("'Total Cash From Operating Activities' not found.")
-            return None
-
-        if "Capital Expenditures" in cashflow_df.index:
-            capex = cashflow_df.loc["Capital Expenditures"]
-        else:
-            log_debug("'Capital Expenditures' not found.")
-            return None
+        for row in _FCF_ROWS:
+            if row not in cashflow_df.index:
+                log_debug(f"'{row}' not found.")
+                return None
         
-        fcf = cfo + capex
+        # Fill missing cells before the float cast so pd.NA in object frames becomes NaN
+        rows = cashflow_df.reindex(_FCF_ROWS).to_numpy(na_value=np.nan)
+        cfo, capex = rows.astype(np.float64)
+        fcf = pd.Series(cfo + capex, index=cashflow_df.columns)
         fcf = fcf.dropna().sort_index(ascending=False)
-        log_debug(f"Free Cash Flow values fetched: {fcf.to_dict()}")
+        log_debug(lambda: f"Free Cash Flow values fetched: {fcf.to_dict()}")
 
         return fcf.head(5)
     
@@ -52,42 +70,63 @@ def fetch_financial_data(ticker):
         log_debug(f"Error fetching financial data: {e}")
         return None
 
+def project_fcf_multistage(last_fcf, stage1_growth, stage1_years, stage2_growth, stage2_years):
+    growths = np.concatenate([
+        np.full(max(int(stage1_years), 0), 1 + stage1_growth, dtype=np.float64),
+        np.full(max(int(stage2_years), 0), 1 + stage2_growth, dtype=np.float64),
+    ])
+    return last_fcf * np.cumprod(growths)
+
+# Present value for each discount rate in `rates`; the discount-factor matrix
+# is built once so a whole sensitivity row costs a single matrix-vector product.
+def dcf_grid(projections, rates, terminal_growth):
+    projections = np.asarray(projections, dtype=np.float64)
+    rates = np.atleast_1d(np.asarray(rates, dtype=np.float64))
+    if not np.all(rates > terminal_growth):
+        raise ValueError("Discount rate / WACC must be greater than terminal growth.")
+    years = len(projections)
+    discount_factors = 1.0 / np.power.outer(1 + rates, np.arange(1, years + 2))
+    terminal_values = projections[-1] * (1 + terminal_growth) / (rates - terminal_growth)
+    return discount_factors[:, :years] @ projections + terminal_values * discount_factors[:, years]
+
+def calculate_dcf(projections, discount_rate, terminal_growth):
+    return float(dcf_grid(projections, [discount_rate], terminal_growth)[0])
+
 def run_dcf_app():
     st.title("DCF + WACC Valuation Tool")
+    st.sidebar.checkbox("Debug mode", key="debug")
 
-    ticker = st.text_input("Enter Ticker Symbol (e.g., AAPL):")
-    stage1_growth = st.number_input("Stage 1 Growth Rate (decimal):", value=0.05)
-    stage1_years = st.number_input("Stage 1 Years:", value=5, step=1)
-    stage2_growth = st.number_input("Stage 2 Growth Rate (decimal):", value=0.03)
-    stage2_years = st.number_input("Stage 2 Years:", value=5, step=1)
-    terminal_growth = st.number_input("Terminal Growth (decimal):", value=0.02)
-    buyback_rate = st.number_input("Annual Share Buyback Rate (decimal):", value=0.0)
-    discount_rate = st.number_input("Discount Rate / WACC (decimal):", value=0.08)
+    # Inputs live in a form so editing a field doesn't rerun the whole script
+    with st.form("dcf_inputs"):
+        ticker = st.text_input("Enter Ticker Symbol (e.g., AAPL):")
+        stage1_growth = st.number_input("Stage 1 Growth Rate (decimal):", value=0.05)
+        stage1_years = st.number_input("Stage 1 Years:", value=5, step=1, min_value=0)
+        stage2_growth = st.number_input("Stage 2 Growth Rate (decimal):", value=0.03)
+        stage2_years = st.number_input("Stage 2 Years:", value=5, step=1, min_value=0)
+        terminal_growth = st.number_input("Terminal Growth (decimal):", value=0.02)
+        buyback_rate = st.number_input("Annual Share Buyback Rate (decimal):", value=0.0)
+        discount_rate = st.number_input("Discount Rate / WACC (decimal):", value=0.08)
+        submitted = st.form_submit_button("Run Valuation")
+
+    if submitted:
+        if int(stage1_years) + int(stage2_years) <= 0:
+            st.error("Stage 1 and Stage 2 years must add up to at least one year.")
+            return
 
-    if st.button("Run Valuation"):
         fcf_series = fetch_financial_data(ticker)
         if fcf_series is None or len(fcf_series) == 0:
-            st.error("Could not fetch financial data. See debug logs above.")
+            st.error("Could not fetch financial data. Enable debug mode in the sidebar for details.")
             return
         
-        avg_fcf = np.mean(fcf_series)
+        avg_fcf = float(fcf_series.to_numpy().mean())
         st.write(f"Average FCF (last {len(fcf_series)} years): {avg_fcf:,.0f}")
 
-        projections = []
-        fcf = avg_fcf
-
-        for _ in range(int(stage1_years)):
-            fcf *= (1 + stage1_growth)
-            projections.append(fcf)
-        for _ in range(int(stage2_years)):
-            fcf *= (1 + stage2_growth)
-            projections.append(fcf)
-
-        terminal_value = projections[-1] * (1 + terminal_growth) / (discount_rate - terminal_growth)
-        projections.append(terminal_value)
-
-        discounted = [proj / ((1 + discount_rate) ** (i+1)) for i, proj in enumerate(projections)]
-        total_value = sum(discounted)
+        projections = project_fcf_multistage(avg_fcf, stage1_growth, stage1_years, stage2_growth, stage2_years)
+        try:
+            total_value = calculate_dcf(projections, discount_rate, terminal_growth)
+        except ValueError as e:
+            st.error(str(e))
+            return
         st.success(f"Estimated Fair Value: {total_value:,.0f}")
 
 if __name__ == "__main__":